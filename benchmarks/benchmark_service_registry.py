@@ -0,0 +1,188 @@
+"""Benchmark building the service registry's tagged image index for a synthetic repository with 100,000 tags.
+
+Run from the repository root with:
+
+    python -m benchmarks.benchmark_service_registry
+"""
+
+import argparse
+import functools
+import multiprocessing
+import resource
+import time
+from unittest.mock import patch
+import urllib.parse
+
+from google.cloud import artifactregistry_v1
+
+from functions.service_registry.main import _get_tagged_images
+
+REPOSITORY_ID = "projects/my-project/locations/my-location/repositories/my-repo"
+
+
+class SyntheticArtifactRegistryClient:
+    def __init__(self, number_of_services, images_per_service, page_size=1000):
+        self.number_of_services = number_of_services
+        self.images_per_service = images_per_service
+        self.page_size = page_size
+
+    def list_docker_images(self, *args, **kwargs):
+        """Yield synthetic image representations one page at a time, like the paginated listing from the artifact
+        registry API. Each image is tagged with a semantic version and a short commit hash, and the newest image of
+        each service is also tagged with "default" and "latest".
+
+        :return iter(google.cloud.artifactregistry_v1.DockerImage):
+        """
+        page = []
+
+        for service_index in range(self.number_of_services):
+            quoted_suid = urllib.parse.quote(f"my-org/service-{service_index}")
+
+            for image_index in range(self.images_per_service):
+                tags = [f"{image_index // 10}.{image_index % 10}.0", f"{service_index:04x}{image_index:04x}"]
+
+                if image_index == self.images_per_service - 1:
+                    tags.extend(["default", "latest"])
+
+                page.append(
+                    artifactregistry_v1.DockerImage(
+                        name=f"{REPOSITORY_ID}/dockerImages/{quoted_suid}@sha256:{service_index:032x}{image_index:032x}",
+                        uri=f"my-location-docker.pkg.dev/my-project/my-repo/my-org/service-{service_index}",
+                        tags=tags,
+                        image_size_bytes=123456789,
+                        media_type="application/vnd.docker.distribution.manifest.v2+json",
+                    )
+                )
+
+                if len(page) == self.page_size:
+                    yield from page
+                    page = []
+
+        yield from page
+
+
+class StaticArtifactRegistryClient:
+    def __init__(self, images):
+        self.images = images
+
+    def list_docker_images(self, *args, **kwargs):
+        return self.images
+
+
+def get_tagged_images_as_protobufs(repository_id):
+    """Build the tagged image index in the previous format (every tag mapped to the full image protobuf object) for
+    comparison.
+
+    :param str repository_id: the artifact registry repository ID
+    :return dict: the names of the tagged images (e.g. "octue/my-image:0.1.0") mapped to their image representations
+    """
+    client = artifactregistry_v1.ArtifactRegistryClient()
+    request = artifactregistry_v1.ListDockerImagesRequest(parent=repository_id)
+    tagged_images = {}
+
+    for image in client.list_docker_images(request=request):
+        if not image.tags:
+            continue
+
+        image_name = urllib.parse.unquote(image.name).split(repository_id + "/dockerImages/")[-1].split("@")[0]
+
+        for image_tag in image.tags:
+            tagged_images[f"{image_name}:{image_tag}"] = image
+
+    return tagged_images
+
+
+BUILDERS = {"protobuf": get_tagged_images_as_protobufs, "compact": _get_tagged_images}
+
+
+def measure_build_time(name, number_of_services, images_per_service, repeats):
+    """Time building a tagged image index. The synthetic images are generated up front so only the time taken to build
+    the index is measured.
+
+    :param str name: the name of the builder to use
+    :param int number_of_services: the number of services in the synthetic repository
+    :param int images_per_service: the number of images per service in the synthetic repository
+    :param int repeats: the number of timed builds to take the best time from
+    :return float: the best build time in seconds
+    """
+    images = list(SyntheticArtifactRegistryClient(number_of_services, images_per_service).list_docker_images())
+    client = functools.partial(StaticArtifactRegistryClient, images=images)
+    build_times = []
+
+    with patch("google.cloud.artifactregistry_v1.ArtifactRegistryClient", client):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            build(name)
+            build_times.append(time.perf_counter() - start)
+
+    return min(build_times)
+
+
+def measure_peak_memory(name, number_of_services, images_per_service):
+    """Measure how much the peak resident memory of the process increases by when building a tagged image index from a
+    streamed, paginated listing. This is run in a fresh process so earlier measurements don't affect it. Resident
+    memory is used rather than `tracemalloc` because protobuf objects are allocated outside the Python allocator.
+
+    :param str name: the name of the builder to use
+    :param int number_of_services: the number of services in the synthetic repository
+    :param int images_per_service: the number of images per service in the synthetic repository
+    :return int: the increase in peak resident memory in bytes
+    """
+    client = functools.partial(
+        SyntheticArtifactRegistryClient,
+        number_of_services=number_of_services,
+        images_per_service=images_per_service,
+    )
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with patch("google.cloud.artifactregistry_v1.ArtifactRegistryClient", client):
+        tagged_images = build(name)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del tagged_images
+
+    # `ru_maxrss` is in kilobytes on Linux.
+    return (peak - baseline) * 1024
+
+
+def build(name):
+    """Build a tagged image index with the named builder.
+
+    :param str name: the name of the builder to use
+    :return dict: the tagged image index
+    """
+    return BUILDERS[name](REPOSITORY_ID)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", type=int, default=1000, help="The number of services in the repository.")
+    parser.add_argument("--images-per-service", type=int, default=50, help="The number of images per service.")
+    parser.add_argument("--repeats", type=int, default=3, help="The number of timed builds to take the best of.")
+    args = parser.parse_args()
+
+    number_of_tags = sum(
+        len(image.tags)
+        for image in SyntheticArtifactRegistryClient(args.services, args.images_per_service).list_docker_images()
+    )
+
+    print(
+        f"Synthetic repository: {args.services} services, {args.images_per_service} images each, {number_of_tags} tags"
+    )
+    print(f"{'Index':<12}{'Build time (s)':>16}{'Peak memory increase (MiB)':>30}")
+
+    context = multiprocessing.get_context("spawn")
+
+    for name in BUILDERS:
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            peak_memory = pool.apply(measure_peak_memory, (name, args.services, args.images_per_service))
+
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            build_time = pool.apply(measure_build_time, (name, args.services, args.images_per_service, args.repeats))
+
+        print(f"{name:<12}{build_time:>16.3f}{peak_memory / 2**20:>30.1f}")
+
+
+if __name__ == "__main__":
+    main()
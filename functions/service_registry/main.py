@@ -1,29 +1,69 @@
 import os
+import re
+import sys
 import urllib.parse
 
 import functions_framework
 from google.cloud import artifactregistry_v1
 
+# Docker tags can't contain "+", so semantic version tags never include build metadata.
+SEMANTIC_VERSION_PATTERN = re.compile(
+    r"(?P<major>0|[1-9][0-9]*)\.(?P<minor>0|[1-9][0-9]*)\.(?P<patch>0|[1-9][0-9]*)(?:-(?P<prerelease>[0-9A-Za-z.-]+))?"
+)
+
+REVISION_RANGE_PATTERN = re.compile(
+    r"(?P<operator>[\^~]?)(?P<major>0|[1-9][0-9]*)(?:\.(?P<minor>0|[1-9][0-9]*|[xX*])(?:\.(?P<patch>0|[1-9][0-9]*|[xX*]))?)?"
+)
+
+LATEST_STABLE = "latest-stable"
+
+LIST_DOCKER_IMAGES_PAGE_SIZE = 1000
+
+
+class TaggedImage:
+    """A compact representation of a tagged image in the artifact registry repository. Only the fields used by the
+    service registry are kept, and a single instance is shared between all tags of the image.
+
+    :param tuple(str) tags: the image's tags
+    :param str digest: the image's digest (e.g. "sha256:...")
+    """
+
+    __slots__ = ("tags", "digest")
+
+    def __init__(self, tags, digest):
+        self.tags = tags
+        self.digest = digest
+
+    def __repr__(self):
+        return f"<{type(self).__name__}(tags={self.tags!r}, digest={self.digest!r})>"
+
 
 @functions_framework.http
 def handle_request(request):
     """Handle a service registry request. This service registry supports:
     - Checking if a service revision exists
     - Getting the default revision tag for a service
+    - Getting the revision tag of the highest service revision in a semantic version range
 
     :param flask.Request request: the request
     :return tuple(str|dict, int): a message and HTTP response code
     """
     suid = urllib.parse.urlparse(request.path).path.strip("/")
     revision_tag = request.args.get("revision_tag")
+    revision_range = request.args.get("revision_range")
+
+    if revision_tag and revision_range:
+        return ("Only one of `revision_tag` and `revision_range` can be given.", 400)
+
     tagged_images = _get_tagged_images(repository_id=os.environ["ARTIFACT_REGISTRY_REPOSITORY_ID"])
 
     if not revision_tag:
-        return _get_default_revision(suid, tagged_images)
+        if revision_range:
+            return _get_revision_in_range(suid, revision_range, tagged_images)
 
-    sruid = f"{suid}:{revision_tag}"
+        return _get_default_revision(suid, tagged_images)
 
-    if sruid in tagged_images:
+    if revision_tag in tagged_images.get(suid, {}):
         return ("Service revision found", 200)
 
     return ("Service revision does not exist", 404)
@@ -33,23 +73,30 @@ def _get_tagged_images(repository_id):
     """Get a representation of the tagged images that exist in the artifact registry repository.
 
     :param str repository_id: the artifact registry repository ID in "projects/<project-id>/locations/<region>/repositories/<repository-name>" format
-    :return dict: the names of the tagged images (e.g. "octue/my-image:0.1.0") mapped to their image representations
+    :return dict(str, dict(str, TaggedImage)): the names of the images (e.g. "octue/my-image") mapped to their tags mapped to their image representations
     """
     repository_id = repository_id.strip("/")
+    image_name_prefix = repository_id + "/dockerImages/"
 
     client = artifactregistry_v1.ArtifactRegistryClient()
-    request = artifactregistry_v1.ListDockerImagesRequest(parent=repository_id)
+    request = artifactregistry_v1.ListDockerImagesRequest(parent=repository_id, page_size=LIST_DOCKER_IMAGES_PAGE_SIZE)
     tagged_images = {}
 
+    # Only the image's tags and digest are kept, so the full image representations from the listing can be discarded.
     for image in client.list_docker_images(request=request):
         # Untagged images aren't service revision images.
         if not image.tags:
             continue
 
-        image_name = urllib.parse.unquote(image.name).split(repository_id + "/dockerImages/")[-1].split("@")[0]
+        image_name, _, digest = urllib.parse.unquote(image.name).split(image_name_prefix)[-1].partition("@")
+
+        # Intern the tags so tags shared between services (e.g. "default", "latest", and common version numbers) are
+        # only stored once.
+        tagged_image = TaggedImage(tags=tuple(sys.intern(tag) for tag in image.tags), digest=digest)
+        image_tags = tagged_images.setdefault(image_name, {})
 
-        for image_tag in image.tags:
-            tagged_images[f"{image_name}:{image_tag}"] = image
+        for image_tag in tagged_image.tags:
+            image_tags[image_tag] = tagged_image
 
     return tagged_images
 
@@ -62,19 +109,130 @@ def _get_default_revision(suid, tagged_images):
     :param dict tagged_images: the tagged images that exist in the artifact registry repository
     :return (dict|str, int): the response
     """
-    default_sruid = f"{suid}:default"
+    default_image = tagged_images.get(suid, {}).get("default")
 
-    if default_sruid in tagged_images:
-        image_tags = tagged_images[default_sruid].tags
+    if default_image:
+        image_tags = [tag for tag in default_image.tags if tag not in {"default", "latest"}]
 
-        # Try and replace "default" with an explicit revision tag.
-        for tag in image_tags:
-            if tag in {"default", "latest"}:
-                continue
+        # Try and replace "default" with an explicit revision tag, preferring the highest semantic version tag.
+        version_tags = [tag for tag in image_tags if _get_semantic_version_key(tag)]
 
-            return ({"revision_tag": tag}, 200)
+        if version_tags:
+            return ({"revision_tag": max(version_tags, key=_get_semantic_version_key)}, 200)
+
+        if image_tags:
+            return ({"revision_tag": min(image_tags)}, 200)
 
         # Return "default" if one isn't found.
         return ({"revision_tag": "default"}, 200)
 
     return (f"No default service revision found for {suid!r}.", 404)
+
+
+def _get_revision_in_range(suid, revision_range, tagged_images):
+    """Get the revision tag of the highest stable service revision of the given service that's in the given semantic
+    version range. Pre-release revisions are never matched.
+
+    :param str suid: the service unique identifier (SUID) for the service to get a revision of
+    :param str revision_range: a semantic version range (e.g. "^1.2", "~1.2.3", "1.x", or "latest-stable")
+    :param dict tagged_images: the tagged images that exist in the artifact registry repository
+    :return (dict|str, int): the response
+    """
+    try:
+        lower_bound, upper_bound = _parse_revision_range(revision_range)
+    except ValueError:
+        return (f"Invalid revision range {revision_range!r}.", 400)
+
+    matching_versions = {}
+
+    for tag in tagged_images.get(suid, {}):
+        key = _get_semantic_version_key(tag)
+
+        # Only match stable versions (i.e. those without a pre-release component).
+        if not key or not key[3]:
+            continue
+
+        version = key[:3]
+
+        if version >= lower_bound and (upper_bound is None or version < upper_bound):
+            matching_versions[version] = tag
+
+    if matching_versions:
+        return ({"revision_tag": matching_versions[max(matching_versions)]}, 200)
+
+    return (f"No service revision in range {revision_range!r} found for {suid!r}.", 404)
+
+
+def _get_semantic_version_key(tag):
+    """Get a key for sorting the given tag by semantic version precedence. Pre-release versions sort below the
+    corresponding stable version.
+
+    :param str tag: the revision tag to get the key for
+    :return tuple|None: the sort key, or `None` if the tag isn't a semantic version
+    """
+    match = SEMANTIC_VERSION_PATTERN.fullmatch(tag)
+
+    if not match:
+        return None
+
+    version = (int(match["major"]), int(match["minor"]), int(match["patch"]))
+
+    if match["prerelease"] is None:
+        return (*version, 1, ())
+
+    # Numeric identifiers have lower precedence than alphanumeric identifiers and are compared numerically.
+    prerelease = tuple(
+        (0, int(identifier)) if identifier.isdigit() else (1, identifier)
+        for identifier in match["prerelease"].split(".")
+    )
+
+    return (*version, 0, prerelease)
+
+
+def _parse_revision_range(revision_range):
+    """Parse a semantic version range into an inclusive lower bound and an exclusive upper bound. The supported ranges
+    are:
+    - Caret ranges (e.g. "^1.2" matches ">=1.2.0 <2.0.0" and "^0.2.3" matches ">=0.2.3 <0.3.0")
+    - Tilde ranges (e.g. "~1.2.3" matches ">=1.2.3 <1.3.0")
+    - Partial versions and X-ranges (e.g. "1", "1.x", and "1.*" match ">=1.0.0 <2.0.0")
+    - Exact versions (e.g. "1.2.3")
+    - "latest-stable", which matches any stable version
+
+    :param str revision_range: the semantic version range to parse
+    :raise ValueError: if the range is invalid
+    :return (tuple(int, int, int), tuple(int, int, int)|None): the inclusive lower bound and exclusive upper bound (`None` if there's no upper bound)
+    """
+    if revision_range == LATEST_STABLE:
+        return (0, 0, 0), None
+
+    match = REVISION_RANGE_PATTERN.fullmatch(revision_range)
+
+    if not match:
+        raise ValueError(f"Invalid revision range {revision_range!r}.")
+
+    parts = [match["major"], match["minor"], match["patch"]]
+    specified = []
+
+    for part in parts:
+        if part is None or not part.isdigit():
+            break
+
+        specified.append(int(part))
+
+    # Wildcards can only be followed by other wildcards.
+    if any(part is not None and part.isdigit() for part in parts[len(specified) :]):
+        raise ValueError(f"Invalid revision range {revision_range!r}.")
+
+    lower_bound = tuple(specified + [0] * (3 - len(specified)))
+
+    if match["operator"] == "^":
+        # Allow changes that don't modify the left-most non-zero specified part.
+        bump_index = next((i for i, part in enumerate(specified) if part != 0), len(specified) - 1)
+    elif match["operator"] == "~":
+        # Allow patch-level changes if a minor version is specified, otherwise allow minor-level changes.
+        bump_index = min(len(specified) - 1, 1)
+    else:
+        bump_index = len(specified) - 1
+
+    upper_bound = (*lower_bound[:bump_index], lower_bound[bump_index] + 1, *([0] * (2 - bump_index)))
+    return lower_bound, upper_bound
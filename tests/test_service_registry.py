@@ -7,7 +7,7 @@ import urllib.parse
 
 import flask
 
-from functions.service_registry.main import handle_request
+from functions.service_registry.main import _get_tagged_images, handle_request
 
 ARTIFACT_REPOSITORY_ID = "projects/my-project/locations/my-location/repositories/my-repo"
 SUID = "my-org/my-service"
@@ -51,6 +51,29 @@ class TestServiceRegistry(unittest.TestCase):
 
         self.assertEqual(response, ("Service revision found", 200))
 
+    def test_tagged_images_share_compact_representation_between_tags(self):
+        """Test that tagged images are indexed by service and then by tag, with a single compact representation shared
+        between all the tags of an image.
+        """
+        MockClient = MockArtifactRegistryClient.from_images(
+            [
+                SimpleNamespace(
+                    name=f"{ARTIFACT_REPOSITORY_ID}/dockerImages/{QUOTED_SUID}@sha256:abc",
+                    tags=["default", REVISION_TAG],
+                ),
+                SimpleNamespace(name=f"{ARTIFACT_REPOSITORY_ID}/dockerImages/{QUOTED_SUID}@sha256:def", tags=[]),
+            ]
+        )
+
+        with patch("google.cloud.artifactregistry_v1.ArtifactRegistryClient", MockClient):
+            tagged_images = _get_tagged_images(repository_id=ARTIFACT_REPOSITORY_ID)
+
+        self.assertEqual(list(tagged_images), [SUID])
+        self.assertEqual(list(tagged_images[SUID]), ["default", REVISION_TAG])
+        self.assertIs(tagged_images[SUID]["default"], tagged_images[SUID][REVISION_TAG])
+        self.assertEqual(tagged_images[SUID][REVISION_TAG].tags, ("default", REVISION_TAG))
+        self.assertEqual(tagged_images[SUID][REVISION_TAG].digest, "sha256:abc")
+
 
 class TestServiceRegistryWithDefaultServiceRevisions(unittest.TestCase):
     def test_with_nonexistent_default_service_revision(self):
@@ -110,6 +133,109 @@ class TestServiceRegistryWithDefaultServiceRevisions(unittest.TestCase):
 
         self.assertEqual(response, ({"revision_tag": "default"}, 200))
 
+    def test_highest_version_tag_returned_for_default_service_revision(self):
+        """Test that the highest semantic version tag of the default service revision is returned regardless of the
+        order of its tags.
+        """
+        request = flask.Request(environ={})
+        request.path = f"https://my-service-registry.com/{SUID}"
+
+        MockClient = MockArtifactRegistryClient.from_images(
+            [
+                SimpleNamespace(
+                    name=f"{ARTIFACT_REPOSITORY_ID}/dockerImages/{QUOTED_SUID}@some-sha",
+                    tags=["my-branch", "0.9.0", "default", "0.10.0", "latest", "0.10.0-rc.1"],
+                )
+            ]
+        )
+
+        with patch("google.cloud.artifactregistry_v1.ArtifactRegistryClient", MockClient):
+            with patch.dict(os.environ, {"ARTIFACT_REGISTRY_REPOSITORY_ID": ARTIFACT_REPOSITORY_ID}):
+                response = handle_request(request)
+
+        self.assertEqual(response, ({"revision_tag": "0.10.0"}, 200))
+
+
+class TestServiceRegistryWithRevisionRanges(unittest.TestCase):
+    IMAGES = [
+        SimpleNamespace(name=f"{ARTIFACT_REPOSITORY_ID}/dockerImages/{QUOTED_SUID}@sha-{i}", tags=tags)
+        for i, tags in enumerate(
+            [
+                ["0.1.0"],
+                ["0.1.3"],
+                ["0.2.0"],
+                ["1.2.0"],
+                ["1.2.9"],
+                ["1.10.1", "default"],
+                ["2.0.0-rc.1", "latest"],
+                ["my-branch"],
+            ]
+        )
+    ] + [
+        SimpleNamespace(
+            name=f"{ARTIFACT_REPOSITORY_ID}/dockerImages/{urllib.parse.quote('my-org/another-service')}@sha",
+            tags=["5.0.0"],
+        )
+    ]
+
+    def _get_response(self, revision_range):
+        request = flask.Request(environ={})
+        request.path = f"https://my-service-registry.com/{SUID}"
+        request.args = {"revision_range": revision_range}
+
+        MockClient = MockArtifactRegistryClient.from_images(self.IMAGES)
+
+        with patch.dict(os.environ, {"ARTIFACT_REGISTRY_REPOSITORY_ID": ARTIFACT_REPOSITORY_ID}):
+            with patch("google.cloud.artifactregistry_v1.ArtifactRegistryClient", MockClient):
+                return handle_request(request)
+
+    def test_highest_matching_revision_returned(self):
+        """Test that the revision tag of the highest stable service revision in the range is returned."""
+        for revision_range, expected_revision_tag in (
+            ("^1.2", "1.10.1"),
+            ("^1.2.5", "1.10.1"),
+            ("~1.2", "1.2.9"),
+            ("1.x", "1.10.1"),
+            ("1.2.*", "1.2.9"),
+            ("1.2.0", "1.2.0"),
+            ("^0.1", "0.1.3"),
+            ("~0", "0.2.0"),
+            ("latest-stable", "1.10.1"),
+        ):
+            with self.subTest(revision_range=revision_range):
+                self.assertEqual(self._get_response(revision_range), ({"revision_tag": expected_revision_tag}, 200))
+
+    def test_404_returned_if_no_revision_in_range(self):
+        """Test that a 404 is returned if no stable service revision is in the range."""
+        for revision_range in ("^2", "1.3.x", "0.1.1", "^0.0"):
+            with self.subTest(revision_range=revision_range):
+                self.assertEqual(
+                    self._get_response(revision_range),
+                    (f"No service revision in range {revision_range!r} found for 'my-org/my-service'.", 404),
+                )
+
+    def test_400_returned_for_invalid_revision_range(self):
+        """Test that a 400 is returned for an invalid revision range."""
+        for revision_range in ("^1.x.2", ">=1.0.0", "01.2", "latest", "^1.1٣"):
+            with self.subTest(revision_range=revision_range):
+                self.assertEqual(
+                    self._get_response(revision_range), (f"Invalid revision range {revision_range!r}.", 400)
+                )
+
+    def test_400_returned_if_revision_tag_and_revision_range_both_given(self):
+        """Test that a 400 is returned if both a revision tag and a revision range are given."""
+        request = flask.Request(environ={})
+        request.path = f"https://my-service-registry.com/{SUID}"
+        request.args = {"revision_tag": "1.2.0", "revision_range": "^1.2"}
+
+        MockClient = MockArtifactRegistryClient.from_images(self.IMAGES)
+
+        with patch.dict(os.environ, {"ARTIFACT_REGISTRY_REPOSITORY_ID": ARTIFACT_REPOSITORY_ID}):
+            with patch("google.cloud.artifactregistry_v1.ArtifactRegistryClient", MockClient):
+                response = handle_request(request)
+
+        self.assertEqual(response, ("Only one of `revision_tag` and `revision_range` can be given.", 400))
+
 
 class MockArtifactRegistryClient:
     def __init__(self, images=None):